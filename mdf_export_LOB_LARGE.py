@@ -21,6 +21,8 @@ import sys
 import argparse
 import struct
 import binascii
+import hashlib
+import tempfile
 from ctypes import *
 
 # Global - all of leaf page&slot lists specified by Page&Slot LOB
@@ -215,7 +217,7 @@ def create_leaf_list(input_file, page):
             leaf_slot_list.append(libody.slot)
     return
 
-def write_data_from_leaf_lists(input_file, output_file, page_list, slot_list):
+def write_data_from_leaf_lists(input_file, output_files, page_list, slot_list, hashes):
     rhdr = RecordHeaderType3_4()
     size = 0
     i = 0
@@ -243,19 +245,50 @@ def write_data_from_leaf_lists(input_file, output_file, page_list, slot_list):
         if rhdr.type != 3: # DATA
             print("Specified Page&Slot is not LARGE_ROOT. Need additional implementation.")
         data = input_file.read(rhdr.length-14)
-        output_file.write(data)
+        for output_file in output_files:
+            output_file.write(data)
+        for h in hashes: # hash while streaming to avoid second read of output
+            h.update(data)
         i += 1
         size += len(data)
     return size
 
+def get_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+def store_blob(temp_path, store_dir, sha256):
+    # content-addressed store: file name is SHA-256, skip blob already stored
+    store_path = os.path.join(store_dir, sha256)
+    if os.path.exists(store_path):
+        os.remove(temp_path)
+        return "duplicate"
+    # temp file is created with 0600, give stored blob same mode as regular output file
+    os.chmod(temp_path, 0o666 & ~get_umask())
+    os.replace(temp_path, store_path)
+    return "new"
+
+def write_manifest(manifest, page, slot, size, md5, sha256, status, output):
+    new_manifest = not os.path.exists(manifest) or os.path.getsize(manifest) == 0
+    with open(manifest, "a") as manifest_file:
+        if new_manifest:
+            print("page", "slot", "size", "md5", "sha256", "status", "output", sep=',', file=manifest_file)
+        print(page, slot, size, md5, sha256, status, output, sep=',', file=manifest_file)
+
 def main():
     parser = argparse.ArgumentParser(description="Extract LOB DATA from specified LARGE_ROOT_YUKON(Record Type 5) Page&Slot")
     parser.add_argument('-i', '--input', action='store', type=str, required=True, help='path to MDF file')
-    parser.add_argument('-o', '--output', action='store', type=str, required=True, help='path to output file')
+    parser.add_argument('-o', '--output', action='store', type=str, help='path to output file (appended, MD5/SHA256 are of this blob only)')
     parser.add_argument('-p', '--page', action='store', type=int, required=True, help='PageNum')
     parser.add_argument('-s', '--slot', action='store', type=int, required=True, help='SlotNum')
+    parser.add_argument('-c', '--store', action='store', type=str, help='path to content-addressed store directory (file name is SHA-256)')
+    parser.add_argument('-m', '--manifest', action='store', type=str, help='path to manifest CSV (page, slot, size, hash of each blob)')
     args = parser.parse_args()
 
+    if not args.output and not args.store:
+        sys.exit("ERROR: specify output file (-o) and/or store directory (-c).")
+
     if os.path.exists(os.path.abspath(args.input)):
         input_file = open(args.input, "rb")
         input_size = os.path.getsize(args.input)
@@ -266,9 +299,37 @@ def main():
     rel_offset = get_offset_from_slotnum(input_file, offset, args.slot)
     print("Page {0}, Slot {1} => Offset {2}".format(args.page, args.slot, rel_offset))
     get_leaf_pages_from_root(input_file, offset, rel_offset)
-    output_file = open(args.output, "ab")        
-    size = write_data_from_leaf_lists(input_file, output_file, leaf_page_list, leaf_slot_list)
+    output_files = []
+    if args.output:
+        output_files.append(open(args.output, "ab"))
+    if args.store:
+        os.makedirs(args.store, exist_ok=True)
+        temp_file = tempfile.NamedTemporaryFile(dir=args.store, prefix=".tmp", delete=False)
+        output_files.append(temp_file)
+    hashes = [hashlib.md5(), hashlib.sha256()]
+    try:
+        size = write_data_from_leaf_lists(input_file, output_files, leaf_page_list, leaf_slot_list, hashes)
+        for output_file in output_files:
+            output_file.close()
+    except BaseException:
+        # do not leave partial blob in store
+        for output_file in output_files:
+            output_file.close()
+        if args.store:
+            os.remove(temp_file.name)
+        raise
+    md5 = hashes[0].hexdigest()
+    sha256 = hashes[1].hexdigest()
     print("Wrote {0} bytes".format(size))
+    print("MD5: {0}".format(md5))
+    print("SHA256: {0}".format(sha256))
+
+    status = ""
+    if args.store:
+        status = store_blob(temp_file.name, args.store, sha256)
+        print("Store: {0} ({1})".format(os.path.join(args.store, sha256), status))
+    if args.manifest:
+        write_manifest(args.manifest, args.page, args.slot, size, md5, sha256, status, args.output or "")
 
 if __name__ == "__main__":
     main()
@@ -21,6 +21,8 @@ import sys
 import argparse
 import struct
 import binascii
+import hashlib
+import tempfile
 from ctypes import *
 
 # https://improve.dk/reverse-engineering-sql-server-page-headers/
@@ -100,12 +102,46 @@ def print_SMALLROOT_from_slotnum(input_file, offset, slot):
     input_file.seek(4,1)
     data = input_file.read(size)
     print(data)
+    return data
+
+def get_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+def store_blob(data, store_dir, sha256):
+    # content-addressed store: file name is SHA-256, skip blob already stored
+    store_path = os.path.join(store_dir, sha256)
+    if os.path.exists(store_path):
+        return "duplicate"
+    # write to temp file and rename, so interrupted write never leaves partial blob under hash name
+    temp_file = tempfile.NamedTemporaryFile(dir=store_dir, prefix=".tmp", delete=False)
+    try:
+        temp_file.write(data)
+        temp_file.close()
+    except BaseException:
+        temp_file.close()
+        os.remove(temp_file.name)
+        raise
+    # temp file is created with 0600, give stored blob same mode as regular output file
+    os.chmod(temp_file.name, 0o666 & ~get_umask())
+    os.replace(temp_file.name, store_path)
+    return "new"
+
+def write_manifest(manifest, page, slot, size, md5, sha256, status, output):
+    new_manifest = not os.path.exists(manifest) or os.path.getsize(manifest) == 0
+    with open(manifest, "a") as manifest_file:
+        if new_manifest:
+            print("page", "slot", "size", "md5", "sha256", "status", "output", sep=',', file=manifest_file)
+        print(page, slot, size, md5, sha256, status, output, sep=',', file=manifest_file)
 
 def main():
     parser = argparse.ArgumentParser(description="Extract LOB SMALL_ROOT data from specified Page&Slot")
     parser.add_argument('-i', '--input', action='store', type=str, required=True, help='path to MDF file')
     parser.add_argument('-p', '--page', action='store', type=int, required=True, help='PageNum')
     parser.add_argument('-s', '--slot', action='store', type=int, required=True, help='SlotNum')
+    parser.add_argument('-c', '--store', action='store', type=str, help='path to content-addressed store directory (file name is SHA-256)')
+    parser.add_argument('-m', '--manifest', action='store', type=str, help='path to manifest CSV (page, slot, size, hash of each blob)')
     args = parser.parse_args()
 
     if os.path.exists(os.path.abspath(args.input)):
@@ -115,7 +151,22 @@ def main():
         sys.exit("{0} does not exist.".format(args.input))
 
     offset = args.page * 0x2000
-    print_SMALLROOT_from_slotnum(input_file, offset, args.slot)
+    data = print_SMALLROOT_from_slotnum(input_file, offset, args.slot)
+    if not args.store and not args.manifest:
+        return
+
+    md5 = hashlib.md5(data).hexdigest()
+    sha256 = hashlib.sha256(data).hexdigest()
+    print("MD5: {0}".format(md5))
+    print("SHA256: {0}".format(sha256))
+
+    status = ""
+    if args.store:
+        os.makedirs(args.store, exist_ok=True)
+        status = store_blob(data, args.store, sha256)
+        print("Store: {0} ({1})".format(os.path.join(args.store, sha256), status))
+    if args.manifest:
+        write_manifest(args.manifest, args.page, args.slot, len(data), md5, sha256, status, "")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+# mdf_parse_compressed_record.py
+#
+# Copyright 2020 4n6ist
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+import argparse
+import struct
+import binascii
+from ctypes import *
+
+# CD array codes (4bit per column)
+CD_NULL = 0
+CD_EMPTY = 1
+CD_LONG = 10
+CD_BIT_ONE = 11
+CD_SYMBOL = 12
+
+CD_RECORD_TYPES = ("PRIMARY", "GHOST_EMPTY", "FORWARDING", "GHOST_DATA", "FORWARDED", "GHOST_FORWARDED", "INDEX", "GHOST_INDEX")
+
+# https://improve.dk/reverse-engineering-sql-server-page-headers/
+class PageHeader(LittleEndianStructure):
+    _pack_ = 1
+    _fields_ = (
+        ('headerVer', c_int8),
+        ('type', c_int8),
+        ('typeFlag', c_uint8),
+        ('level', c_int8),
+        ('flag', c_uint16),
+        ('indexId', c_int16),
+        ('prevPageId', c_int32),
+        ('prevFileId', c_int16),
+        ('pminlen', c_int16),
+        ('nextPageId', c_int32),
+        ('nextFileId', c_int16),
+        ('slotCnt', c_int16),
+        ('objId', c_int32),
+        ('freeCnt', c_int16),
+        ('freeData', c_int16),
+        ('pageId', c_int32),
+        ('fileId', c_int16),
+        ('reservedCnt', c_int16),
+        ('lsn1', c_int32),
+        ('lsn2', c_int32),
+        ('lsn3', c_int16),
+        ('xactReserved', c_int16),
+        ('xdesId2', c_int32),
+        ('xdesId1', c_int16),
+        ('ghostRecCnt', c_int16),
+        ('unknown', c_char * 36)
+    )
+    def __init__(self):
+        self.unknown = b'\x00'
+
+class CompressionInfoHeader(LittleEndianStructure):
+    _pack_ = 1
+    _fields_ = (
+        ('flag', c_uint8),
+        ('pageModCount', c_uint16),
+        ('length', c_uint16)
+    )
+    def print_info(self):
+        print("CompressionInfo")
+        print(" Flag: {0}".format(self.flag))
+        print(" PageModCount: {0}".format(self.pageModCount))
+        print(" Length: {0}".format(self.length))
+
+def parse_cd_record(page_data, rec_offset):
+    # CD (column descriptor) format of ROW/PAGE compressed record
+    # returns (header, [(code, value, complex)], end offset of record)
+    # or None if record runs over the end of page (corrupted or carved record)
+    page_size = len(page_data)
+    if rec_offset + 3 > page_size:
+        return None
+    header = page_data[rec_offset]
+    pos = rec_offset + 1
+
+    # number of columns: 1 byte, or 2 bytes if most significant bit is set
+    num_of_columns = page_data[pos]
+    pos += 1
+    if num_of_columns & 0x80:
+        num_of_columns = ((num_of_columns & 0x7f) << 8) | page_data[pos]
+        pos += 1
+    if pos + (num_of_columns+1)//2 > page_size:
+        return None
+
+    # CD array: 4bit per column, low nibble first
+    codes = []
+    for j in range(num_of_columns):
+        code = page_data[pos + j//2]
+        codes.append(code & 0x0f if j%2 == 0 else code >> 4)
+    pos += (num_of_columns+1)//2
+
+    # short data region: cluster array (1 byte per 30 columns except last) + values
+    num_of_clusters = (num_of_columns-1)//30 if num_of_columns > 0 else 0
+    pos += num_of_clusters
+    columns = []
+    for code in codes:
+        if 2 <= code <= 9: # 1-8 bytes of short data
+            columns.append([code, page_data[pos:pos+code-1], False])
+            pos += code-1
+        elif code == CD_SYMBOL: # 1 byte index into page dictionary, 2 bytes if msb is set
+            if pos >= page_size:
+                return None
+            if page_data[pos] & 0x80:
+                columns.append([code, page_data[pos:pos+2], False])
+                pos += 2
+            else:
+                columns.append([code, page_data[pos:pos+1], False])
+                pos += 1
+        elif code == CD_EMPTY:
+            columns.append([code, b'', False])
+        elif code == CD_BIT_ONE:
+            columns.append([code, b'\x01', False])
+        else: # NULL or long data
+            columns.append([code, None, False])
+    if pos > page_size:
+        return None
+
+    # long data region: header(1) + num(2) + offset array(2 each) + cluster array + values
+    if header & 0x20:
+        pos += 1
+        if pos + 2 > page_size:
+            return None
+        num_of_lcolumns = struct.unpack_from("<H", page_data, pos)[0]
+        pos += 2
+        if num_of_lcolumns > num_of_columns or pos + 2*num_of_lcolumns + num_of_clusters > page_size:
+            return None
+        l_offsets = struct.unpack_from("<{0}H".format(num_of_lcolumns), page_data, pos)
+        pos += 2*num_of_lcolumns + num_of_clusters
+        l_start = 0
+        long_columns = [column for column in columns if column[0] == CD_LONG]
+        for column, l_offset in zip(long_columns, l_offsets):
+            l_end = l_offset & 0x7fff
+            if l_end < l_start or pos + l_end > page_size:
+                return None
+            column[1] = page_data[pos+l_start:pos+l_end]
+            column[2] = bool(l_offset & 0x8000) # complex column (e.g. pointer to off-row LOB)
+            l_start = l_end
+        pos += l_start
+
+    return header, [tuple(column) for column in columns], pos
+
+def parse_compression_info(page_data):
+    # CI record right after page header: header + anchor record (CD format) + dictionary
+    cihdr = CompressionInfoHeader.from_buffer_copy(page_data, 96)
+    pos = 96 + sizeof(CompressionInfoHeader)
+    dictionary_offset = 0
+    if cihdr.flag & 0x04: # has dictionary
+        dictionary_offset = struct.unpack_from("<H", page_data, pos)[0]
+        pos += 2
+
+    anchors = []
+    if cihdr.flag & 0x02: # has anchor record
+        record = parse_cd_record(page_data, pos)
+        if record is None:
+            print("Anchor record runs over the end of page. Skip prefix decompression.")
+            record = (0, [], pos)
+        header, columns, pos = record
+        for code, value, is_complex in columns:
+            anchors.append(None if code == CD_NULL else value)
+
+    dictionary = []
+    if cihdr.flag & 0x04:
+        pos = 96 + dictionary_offset
+        num_of_entries = 0
+        if pos + 2 <= len(page_data):
+            num_of_entries = struct.unpack_from("<H", page_data, pos)[0]
+            pos += 2
+        if pos + 2*num_of_entries > len(page_data):
+            print("Dictionary runs over the end of page. Skip dictionary.")
+            num_of_entries = 0
+        d_offsets = struct.unpack_from("<{0}H".format(num_of_entries), page_data, pos)
+        pos += 2*num_of_entries
+        d_start = 0
+        for d_end in d_offsets:
+            if d_end < d_start or pos + d_end > len(page_data):
+                print("Dictionary entry runs over the end of page. Skip remaining entries.")
+                break
+            dictionary.append(page_data[pos+d_start:pos+d_end])
+            d_start = d_end
+
+    return cihdr, anchors, dictionary
+
+def decompress_page_columns(columns, anchors, dictionary):
+    # resolve page dictionary symbol first, then column prefix from anchor record
+    values = []
+    for j, (code, value, is_complex) in enumerate(columns):
+        if code == CD_SYMBOL:
+            symbol = value[0] if len(value) == 1 else ((value[0] & 0x7f) << 8) | value[1]
+            if symbol >= len(dictionary): # keep raw symbol of corrupted record
+                values.append((code, value, is_complex))
+                continue
+            value = dictionary[symbol]
+        if value and j < len(anchors) and anchors[j] is not None and code != CD_BIT_ONE and not is_complex:
+            # first byte is length of prefix shared with anchor
+            value = anchors[j][:value[0]] + value[1:]
+        values.append((code, value, is_complex))
+    return values
+
+def decode_cd_int(value):
+    # integers are stored in big endian with minimum bytes, sign bit is flipped
+    if not value:
+        return 0
+    bits = 8*len(value)
+    num = int.from_bytes(value, 'big') ^ (1 << (bits-1))
+    if num & (1 << (bits-1)):
+        num -= 1 << bits
+    return num
+
+def print_cd_columns(columns, numeric):
+    for j, (code, value, is_complex) in enumerate(columns):
+        if value is None:
+            print(" Column {0}: NULL".format(j))
+            continue
+        label = "complex " if is_complex else ""
+        if numeric and code != CD_LONG and not is_complex and len(value) <= 8:
+            print(" Column {0}: {1}{2} ({3})".format(j, label, binascii.hexlify(value).decode('ascii'), decode_cd_int(value)))
+        else:
+            print(" Column {0}: {1}{2}".format(j, label, binascii.hexlify(value).decode('ascii')))
+
+def parse_mdf_compressed_record(input_file, page, numeric):
+    offset = int(page) * 0x2000
+    input_file.seek(offset)
+    page_data = input_file.read(0x2000)
+    if len(page_data) < 0x2000:
+        print("ERROR: Page {0} is beyond end of file".format(page))
+        return
+    phdr = PageHeader.from_buffer_copy(page_data)
+    if phdr.type != 1 and phdr.type != 2:
+        print("ERROR: Specified page is neither data page nor index page")
+        sys.exit()
+
+    # typeFlag 0x80: page has compression info (PAGE compression)
+    # anchor and dictionary are decoded once here and shared by all records of the page,
+    # without it (ROW compression) anchor and dictionary lookups are skipped
+    anchors = []
+    dictionary = []
+    if phdr.typeFlag & 0x80:
+        cihdr, anchors, dictionary = parse_compression_info(page_data)
+        cihdr.print_info()
+        print(" Anchors: {0}, Dictionary: {1}".format(len(anchors), len(dictionary)))
+
+    print("slotCnt: {0}, ".format(phdr.slotCnt),end='')
+    print("freeData {0}".format(phdr.freeData))
+
+    for i in range(phdr.slotCnt):
+        slot_offset = struct.unpack_from("<H", page_data, 0x2000-(2*i)-2)[0]
+        if slot_offset == 0: # deleted slot
+            continue
+        print("")
+        if slot_offset >= 0x2000 or not page_data[slot_offset] & 0x01:
+            print("Offset:{0}, Slot:{1} is not CD format record".format(slot_offset, i))
+            continue
+        record = parse_cd_record(page_data, slot_offset)
+        if record is None:
+            print("Offset:{0}, Slot:{1} runs over the end of page. Skip corrupted record.".format(slot_offset, i))
+            continue
+        header, columns, end = record
+        print("Offset:{0}, Slot:{1}, Length:{2}, Type:{3}".format(slot_offset, i, end-slot_offset, CD_RECORD_TYPES[(header >> 2) & 0x07]))
+        if anchors or dictionary:
+            columns = decompress_page_columns(columns, anchors, dictionary)
+        print_cd_columns(columns, numeric)
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse ROW/PAGE compressed (CD format) records of data page in MDF.")
+    parser.add_argument('-i', '--input', action='store', type=str, required=True, help='path to MDF file')
+    parser.add_argument('-p', '--page', action='store', type=int, nargs='+', required=True, help='PageNum')
+    parser.add_argument('-n', '--numeric', action='store_true', default=False, help='also display short data as compressed integer')
+    args = parser.parse_args()
+
+    if os.path.exists(os.path.abspath(args.input)):
+        input_file = open(args.input, "rb")
+    else:
+        sys.exit("{0} does not exist.".format(args.input))
+
+    for page in args.page:
+        print("Page: {0}".format(page))
+        parse_mdf_compressed_record(input_file, page, args.numeric)
+
+if __name__ == "__main__":
+    main()
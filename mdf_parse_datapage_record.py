@@ -163,6 +163,19 @@ def parse_mdf_Type1_record(input_file, offset, deleted):
         print("ERROR: Specified page is not data page")
         sys.exit()
 
+    # ROW/PAGE compressed records (CD format) can not be parsed as FixedVar record
+    # typeFlag 0x80: page has compression info, status bit 0x01 of first record: CD format
+    status = 0
+    if phdr.slotCnt > 0:
+        input_file.seek(offset+0x2000-2)
+        first_slot_offset = struct.unpack("<H", input_file.read(2))[0]
+        if first_slot_offset != 0:
+            input_file.seek(offset+first_slot_offset)
+            status = struct.unpack("<B", input_file.read(1))[0]
+    if phdr.typeFlag & 0x80 or status & 0x01:
+        print("ERROR: Specified page is compressed. Use mdf_parse_compressed_record.py")
+        sys.exit()
+
     rhdr = RecordHeaderType1()
 
     # create offset list from slot array (offset 0 means deleted slot(record))
@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+# mdf_parse_indexpage_record.py
+#
+# Copyright 2020 4n6ist
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+import argparse
+import struct
+import binascii
+from ctypes import *
+
+# struct format of supported fixed length key columns
+KEY_FORMATS = {
+    'tinyint': '<B',
+    'smallint': '<h',
+    'int': '<i',
+    'bigint': '<q'
+}
+
+# https://improve.dk/reverse-engineering-sql-server-page-headers/
+class PageHeader(LittleEndianStructure):
+    _pack_ = 1
+    _fields_ = (
+        ('headerVer', c_int8),
+        ('type', c_int8),
+        ('typeFlag', c_uint8),
+        ('level', c_int8),
+        ('flag', c_uint16),
+        ('indexId', c_int16),
+        ('prevPageId', c_int32),
+        ('prevFileId', c_int16),
+        ('pminlen', c_int16),
+        ('nextPageId', c_int32),
+        ('nextFileId', c_int16),
+        ('slotCnt', c_int16),
+        ('objId', c_int32),
+        ('freeCnt', c_int16),
+        ('freeData', c_int16),
+        ('pageId', c_int32),
+        ('fileId', c_int16),
+        ('reservedCnt', c_int16),
+        ('lsn1', c_int32),
+        ('lsn2', c_int32),
+        ('lsn3', c_int16),
+        ('xactReserved', c_int16),
+        ('xdesId2', c_int32),
+        ('xdesId1', c_int16),
+        ('ghostRecCnt', c_int16),
+        ('unknown', c_char * 36)
+    )
+    def __init__(self):
+        self.unknown = b'\x00'
+
+class RecordHeaderType1(LittleEndianStructure):
+    _pack_ = 1
+    _fields_ = (
+        ('status', c_int8),
+        ('unknown1', c_int8),
+        ('offset', c_uint16)
+    )
+
+class ChildPagePointer(LittleEndianStructure):
+    _pack_ = 1
+    _fields_ = (
+        ('page', c_uint32),
+        ('fileid', c_uint16)
+    )
+
+# Ref. https://qiita.com/taka_baya/items/c22bd5f5e7cb3de90988 - start
+def read_bytes(input):
+    # extract input data of each 1byte
+    for b in input:
+        yield b
+
+def is_character_printable(s):
+    # return true if a character is readable
+    if s < 126 and s >= 33:
+        return True
+
+def validate_byte_as_printable(byte):
+    # no ascii character display as '.'
+    if is_character_printable(byte):
+        return byte
+    else:
+        return 46
+
+def print_hex(data):
+    memory_address = 0
+    ascii_string = ""
+
+    # display data until EOF
+    for byte in read_bytes(data):
+        ascii_string = ascii_string + chr(validate_byte_as_printable(byte))
+        if memory_address%16 == 0:
+            print(format(memory_address, '06X'), end='')
+            print(" " + hex(byte)[2:].zfill(2), end='')
+        elif memory_address%16 == 15:
+            print(" " + hex(byte)[2:].zfill(2), end='')
+            print(" " + ascii_string)
+            ascii_string = ""
+        else:
+            print(" " + hex(byte)[2:].zfill(2), end='')
+        memory_address = memory_address + 1
+
+    # print ascii for last line
+    if len(data)%16 != 0:
+        padding = 16 - len(data)%16
+        print("   " * padding, end='')
+        print(" " + ascii_string)
+# Ref. - end
+
+def get_slot_array_offsets(input_file, offset, phdr):
+    # slot array is stored in key order from the end of page (offset 0 means deleted slot(record))
+    slot_array_offsets = []
+    for i in range(phdr.slotCnt):
+        input_file.seek(offset+0x2000-(2*i)-2)
+        slot_array_offset = struct.unpack("<H", input_file.read(2))[0]
+        slot_array_offsets.append(slot_array_offset)
+    return slot_array_offsets
+
+def is_ghost_record(status):
+    # bit 1-3 of status represent record type (5: ghost index, 6: ghost data)
+    return (status >> 1) & 0x07 in (5, 6)
+
+def get_record_length(input_file, offset, slot_offset, status, fixed_end):
+    # walk Null Bitmap and variable offset array after the fixed length part
+    input_file.seek(offset+slot_offset+fixed_end)
+    length = fixed_end
+    if status & 0x10: # has Null Bitmap
+        num_of_columns = struct.unpack("<H", input_file.read(2))[0]
+        input_file.seek((num_of_columns+7)//8,1) # skip Null Bitmap
+        length += 2 + (num_of_columns+7)//8
+    if status & 0x20: # has variable length columns
+        num_of_vcolumns = struct.unpack("<H", input_file.read(2))[0]
+        length += 2 + 2*num_of_vcolumns
+        for j in range(num_of_vcolumns):
+            v_offset = struct.unpack("<H", input_file.read(2))[0]
+            length = v_offset & 0x1fff # last one is end of record
+    return length
+
+def parse_mdf_index_page(input_file, page, key_format):
+    # returns list of (slot, key, child page, child fileid) from non-leaf index page
+    # non-leaf index record: status(1) + key columns + child page(4) + fileid(2)
+    # only first key column is decoded, child pointer always ends the fixed part
+    phdr = PageHeader()
+    offset = int(page) * 0x2000
+    input_file.seek(offset)
+    input_file.readinto(phdr)
+    if phdr.type != 2 or phdr.level == 0:
+        print("ERROR: Page {0} is not non-leaf index page".format(page))
+        sys.exit()
+
+    key_size = struct.calcsize(key_format)
+    if phdr.pminlen < 1 + key_size + 6:
+        print("ERROR: pminlen {0} of page {1} is too short for {2} byte key".format(phdr.pminlen, page, key_size))
+        sys.exit()
+
+    child = ChildPagePointer()
+    entries = []
+    for i, slot_offset in enumerate(get_slot_array_offsets(input_file, offset, phdr)):
+        if slot_offset == 0:
+            continue
+        input_file.seek(offset+slot_offset)
+        status = struct.unpack("<B", input_file.read(1))[0]
+        if is_ghost_record(status):
+            continue
+        key = struct.unpack(key_format, input_file.read(key_size))[0]
+        input_file.seek(offset+slot_offset+phdr.pminlen-6)
+        input_file.readinto(child)
+        if i == 0 and phdr.prevPageId == 0:
+            key = None # first record of leftmost page has no lower bound
+        entries.append((i, key, child.page, child.fileid))
+    return entries
+
+def find_child_page(entries, key):
+    # descend to the last child whose lower bound is less than key.
+    # lower bound equal to key may have duplicates on the previous child,
+    # those are reached by following nextPageId on leaf level.
+    child = entries[0]
+    for entry in entries[1:]:
+        if entry[1] is None or entry[1] < key:
+            child = entry
+        else:
+            break
+    return child
+
+def is_valid_page(page, input_size, visited):
+    # guard against corrupted pointer (past EOF or loop) in forensic image
+    if int(page) < 0 or int(page) * 0x2000 >= input_size:
+        print("ERROR: Page {0} is beyond end of file".format(page))
+        return False
+    if page in visited:
+        print("ERROR: Page {0} is already visited (loop in page chain)".format(page))
+        return False
+    visited.add(page)
+    return True
+
+def find_leaf_page(input_file, input_size, root_page, key, key_format):
+    phdr = PageHeader()
+    page = root_page
+    visited = set()
+    while True:
+        if not is_valid_page(page, input_size, visited):
+            sys.exit()
+        input_file.seek(int(page) * 0x2000)
+        input_file.readinto(phdr)
+        if phdr.type == 1 or (phdr.type == 2 and phdr.level == 0):
+            print("Leaf Page: {0}".format(page))
+            return page
+        if phdr.type != 2:
+            print("ERROR: Page {0} is neither index page nor data page".format(page))
+            sys.exit()
+        entries = parse_mdf_index_page(input_file, page, key_format)
+        if not entries:
+            print("ERROR: Page {0} has no index records".format(page))
+            sys.exit()
+        slot, lower, child_page, child_fileid = find_child_page(entries, key)
+        if child_fileid != 1:
+            print("Found irregular FileID. Need additional implementation.")
+        print("Level: {0}, Page: {1}, Slot: {2} => Child Page: {3}".format(phdr.level, page, slot, child_page))
+        page = child_page
+
+def print_records_in_key_range(input_file, input_size, page, low, high, key_format, key_offset):
+    # scan leaf records in slot array order and follow nextPageId until key exceeds high
+    phdr = PageHeader()
+    rhdr = RecordHeaderType1()
+    key_size = struct.calcsize(key_format)
+    found = 0
+    visited = set()
+    while page != 0:
+        if not is_valid_page(page, input_size, visited):
+            return found
+        offset = int(page) * 0x2000
+        input_file.seek(offset)
+        input_file.readinto(phdr)
+        for i, slot_offset in enumerate(get_slot_array_offsets(input_file, offset, phdr)):
+            if slot_offset == 0:
+                continue
+            input_file.seek(offset+slot_offset)
+            input_file.readinto(rhdr)
+            if is_ghost_record(rhdr.status):
+                continue
+            if phdr.type == 1: # data page (leaf of clustered index)
+                fixed_end = rhdr.offset
+                input_file.seek(offset+slot_offset+key_offset)
+            else: # leaf of nonclustered index, key follows status
+                fixed_end = phdr.pminlen
+                input_file.seek(offset+slot_offset+1)
+            key = struct.unpack(key_format, input_file.read(key_size))[0]
+            if key < low:
+                continue
+            if key > high:
+                return found
+            length = get_record_length(input_file, offset, slot_offset, rhdr.status, fixed_end)
+            print("")
+            print("Key:{0}, Page:{1}, Offset:{2}, Slot:{3}".format(key, page, slot_offset, i))
+            input_file.seek(offset+slot_offset)
+            print_hex(input_file.read(length))
+            found += 1
+        if phdr.nextFileId > 1:
+            print("Found irregular FileID. Need additional implementation.")
+        page = phdr.nextPageId
+    return found
+
+def print_index_page(input_file, page, key_format):
+    print("slot", "key", "childPage", "childFileId", sep=',')
+    for slot, key, child_page, child_fileid in parse_mdf_index_page(input_file, page, key_format):
+        print(slot, "" if key is None else key, child_page, child_fileid, sep=',')
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse index page or find records by key from root page of B-tree in MDF.")
+    parser.add_argument('-i', '--input', action='store', type=str, required=True, help='path to MDF file')
+    parser.add_argument('-p', '--page', action='store', type=int, required=True, help='PageNum (root page for key lookup)')
+    parser.add_argument('-k', '--key', action='store', type=int, help='key (start of range) to find, only display index page if omitted')
+    parser.add_argument('-e', '--end', action='store', type=int, help='end of key range (default: same as key)')
+    parser.add_argument('-t', '--keytype', action='store', type=str, default='int', choices=KEY_FORMATS.keys(), help='data type of first key column (default: int)')
+    parser.add_argument('--keyoffset', action='store', type=int, default=4, help='offset of key column in data record (default: 4)')
+    args = parser.parse_args()
+
+    if os.path.exists(os.path.abspath(args.input)):
+        input_file = open(args.input, "rb")
+        input_size = os.path.getsize(args.input)
+    else:
+        sys.exit("{0} does not exist.".format(args.input))
+
+    if args.page * 0x2000 >= input_size:
+        sys.exit("ERROR: Page {0} is beyond end of file.".format(args.page))
+
+    key_format = KEY_FORMATS[args.keytype]
+    if args.key is None:
+        print_index_page(input_file, args.page, key_format)
+        return
+
+    end = args.key if args.end is None else args.end
+    leaf_page = find_leaf_page(input_file, input_size, args.page, args.key, key_format)
+    found = print_records_in_key_range(input_file, input_size, leaf_page, args.key, end, key_format, args.keyoffset)
+    print("")
+    print("Found {0} records".format(found))
+
+if __name__ == "__main__":
+    main()